@@ -74,6 +74,30 @@ def convert_to_raw_bars(df, symbol):
     return raw_bars
 
 
+def convert_to_frame(df):
+    """
+    将 DataFrame 向量化地转换为标准K线表
+
+    逐根读取 RawBar 属性在百万级K线上很慢，绘图、特征计算等批量场景直接使用这张表。
+
+    参数：
+        df: DataFrame, 包含 OHLCV 数据
+
+    返回：
+        DataFrame: 包含 dt, open, close, high, low, vol, amount 列，按时间排序
+    """
+    trade_date = df['trade_date'].astype(str).str.replace(r'\.0$', '', regex=True)
+    if trade_date.str.len().eq(8).all():  # YYYYMMDD 格式
+        dt = pd.to_datetime(trade_date, format='%Y%m%d')
+    else:
+        dt = pd.to_datetime(trade_date)
+
+    frame = pd.DataFrame({'dt': dt.values})
+    for col in ('open', 'close', 'high', 'low', 'vol', 'amount'):
+        frame[col] = df[col].astype(float).values if col in df.columns else 0.0
+    return frame.sort_values('dt', kind='stable').reset_index(drop=True)
+
+
 def analyze_structure(czsc_obj):
     """
     分析缠论结构
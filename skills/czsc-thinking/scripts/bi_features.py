@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+预计算每一笔的特征表，按日期索引并增量更新
+
+signal_analysis.py 每次打印时都临时计算最近几笔的幅度、起止日期等特征。
+这个脚本为每个股票维护一张持久化的笔特征表，每一行对应一笔已确认的笔：
+    - 幅度、涨跌幅、持续K线数和自然日数、斜率
+    - 笔内成交量和成交额合计（不含起点K线，相邻两笔不重复计算）
+    - 笔内最大回撤（向上笔为最大回落，向下笔为最大反弹）
+    - 相对前几笔的位置：终点在前几笔高低区间中的位置、幅度排名、与前一同向笔的幅度比
+
+已保存的笔不会重新计算，新确认的笔追加到表尾。分析和选股可以直接按日期查询历史，
+不需要再遍历 CZSC 对象。
+
+使用方法：
+    python bi_features.py --input data.csv --symbol 000001.SZ
+    python bi_features.py --input data.csv --symbol 000001.SZ --start_date 20240101 --end_date 20240614
+
+依赖：
+    pip install czsc pandas numpy
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from czsc import CZSC, Direction
+
+from analyze_czsc_structure import load_data_from_csv, convert_to_raw_bars, convert_to_frame
+
+
+FEATURE_COLUMNS = [
+    'sdt', 'edt', 'direction', 'start_price', 'end_price', 'amplitude', 'change',
+    'bars', 'days', 'slope', 'vol', 'amount', 'max_drawdown',
+    'pos_in_range', 'amp_rank', 'amp_ratio',
+]
+
+
+def feature_path(output_dir, symbol):
+    """返回股票特征表的保存路径"""
+    return Path(output_dir) / f"{symbol.replace('.', '_')}_bi_features.csv"
+
+
+def load_bi_features(filepath):
+    """
+    加载笔特征表
+
+    返回：
+        DataFrame: 以笔的结束时间 edt 为索引；文件不存在时返回空表
+    """
+    if not Path(filepath).exists():
+        return pd.DataFrame(columns=FEATURE_COLUMNS).set_index('edt', drop=False)
+    df = pd.read_csv(filepath, parse_dates=['sdt', 'edt'])
+    return df.set_index('edt', drop=False).sort_index()
+
+
+def save_bi_features(table, filepath):
+    """保存笔特征表"""
+    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(filepath, index=False, encoding='utf-8-sig')
+
+
+def _max_drawdown(close, up):
+    """笔内沿笔方向的最大不利波动：向上笔为最大回落，向下笔为最大反弹"""
+    if len(close) < 2:
+        return 0.0
+    if up:
+        peak = np.maximum.accumulate(close)
+        return float(((peak - close) / peak).max())
+    trough = np.minimum.accumulate(close)
+    return float(((close - trough) / trough).max())
+
+
+def compute_bi_features(bi_list, bars, history=None, lookback=9):
+    """
+    计算笔特征
+
+    参数：
+        bi_list: list, 需要计算的笔，按时间先后排列
+        bars: DataFrame, convert_to_frame 的结果
+        history: DataFrame, 已有的特征表，用于计算相对前几笔的位置
+        lookback: int, 相对位置特征参考的前几笔数量
+
+    返回：
+        DataFrame: 每笔一行，列为 FEATURE_COLUMNS
+    """
+    dts = bars['dt'].values
+    close = bars['close'].to_numpy(dtype=np.float64)
+    vol = bars['vol'].to_numpy(dtype=np.float64)
+    amount = bars['amount'].to_numpy(dtype=np.float64)
+
+    # 前几笔的 (高点, 低点, 幅度)，新计算的笔也依次加入
+    prev = []
+    if history is not None and len(history):
+        tail = history.tail(lookback)
+        prev = list(zip(tail[['start_price', 'end_price']].max(axis=1),
+                        tail[['start_price', 'end_price']].min(axis=1),
+                        tail['amplitude']))
+
+    rows = []
+    for bi in bi_list:
+        sdt, edt = pd.Timestamp(bi.fx_a.dt), pd.Timestamp(bi.fx_b.dt)
+        start, end = bi.fx_a.fx, bi.fx_b.fx
+        up = bi.direction == Direction.Up
+        i = int(np.searchsorted(dts, np.datetime64(sdt), side='left'))
+        j = int(np.searchsorted(dts, np.datetime64(edt), side='right'))
+        n_bars = max(j - i - 1, 1)
+        amplitude = abs(end - start)
+        change = end / start - 1 if start else np.nan
+
+        if prev:
+            recent = prev[-lookback:]
+            range_high = max(p[0] for p in recent)
+            range_low = min(p[1] for p in recent)
+            span = range_high - range_low
+            pos_in_range = (end - range_low) / span if span > 0 else np.nan
+            amp_rank = sum(p[2] <= amplitude for p in recent) / len(recent)
+        else:
+            pos_in_range = amp_rank = np.nan
+        # 与前一同向笔（前第二笔）比较幅度，signal_analysis.py 的背驰判断使用同一比例
+        amp_ratio = amplitude / prev[-2][2] if len(prev) >= 2 and prev[-2][2] else np.nan
+
+        rows.append({
+            'sdt': sdt,
+            'edt': edt,
+            'direction': str(bi.direction),
+            'start_price': start,
+            'end_price': end,
+            'amplitude': amplitude,
+            'change': change,
+            'bars': n_bars,
+            'days': (edt - sdt).days,
+            'slope': change / n_bars,
+            'vol': float(vol[i + 1:j].sum()),
+            'amount': float(amount[i + 1:j].sum()),
+            'max_drawdown': _max_drawdown(close[i:j], up),
+            'pos_in_range': pos_in_range,
+            'amp_rank': amp_rank,
+            'amp_ratio': amp_ratio,
+        })
+        prev.append((max(start, end), min(start, end), amplitude))
+
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+
+def update_bi_features(table, czsc_obj, bars, lookback=9):
+    """
+    把 CZSC 对象中新确认的笔追加到特征表
+
+    最后一笔在下一笔出现之前仍可能延伸，不计入特征表；已保存的笔不重新计算。
+
+    参数：
+        table: DataFrame, load_bi_features 的结果
+        czsc_obj: CZSC 对象，需保留足够的历史笔
+        bars: DataFrame, convert_to_frame 的结果
+        lookback: int, 相对位置特征参考的前几笔数量
+
+    返回：
+        tuple: (更新后的特征表, 新增行数)
+    """
+    confirmed = czsc_obj.bi_list[:-1]
+    if len(table):
+        last_edt = table['edt'].iloc[-1]
+        confirmed = [bi for bi in confirmed if pd.Timestamp(bi.fx_a.dt) >= last_edt]
+    if not confirmed:
+        return table, 0
+
+    new = compute_bi_features(confirmed, bars, history=table, lookback=lookback)
+    new = new.set_index('edt', drop=False)
+    table = new if not len(table) else pd.concat([table, new])
+    return table, len(new)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预计算并增量更新笔特征表')
+    parser.add_argument('--input', type=str, required=True, help='输入数据文件（CSV格式）')
+    parser.add_argument('--symbol', type=str, required=True, help='股票代码')
+    parser.add_argument('--output_dir', type=str, default='features', help='特征表保存目录，默认 features')
+    parser.add_argument('--lookback', type=int, default=9, help='相对位置特征参考的前几笔数量，默认 9')
+    parser.add_argument('--start_date', type=str, help='查询开始日期，格式 YYYYMMDD')
+    parser.add_argument('--end_date', type=str, help='查询结束日期，格式 YYYYMMDD')
+
+    args = parser.parse_args()
+
+    # 加载数据
+    df = load_data_from_csv(args.input)
+    raw_bars = convert_to_raw_bars(df, args.symbol)
+    bars = convert_to_frame(df)
+
+    print("\n正在创建 CZSC 对象...")
+    czsc_obj = CZSC(raw_bars, max_bi_num=len(raw_bars))
+
+    filepath = feature_path(args.output_dir, args.symbol)
+    table = load_bi_features(filepath)
+    table, added = update_bi_features(table, czsc_obj, bars, lookback=args.lookback)
+    if added:
+        save_bi_features(table, filepath)
+
+    print("\n" + "=" * 60)
+    print("笔特征表")
+    print("=" * 60)
+    print(f"\n特征表：{filepath}")
+    print(f"已确认笔数量：{len(table)}，本次新增：{added}")
+
+    if args.start_date or args.end_date:
+        start = pd.to_datetime(args.start_date, format='%Y%m%d') if args.start_date else None
+        end = pd.to_datetime(args.end_date, format='%Y%m%d') if args.end_date else None
+        view = table.loc[start:end]
+        print(f"\n{args.start_date or '最早'} - {args.end_date or '最新'} 结束的笔：{len(view)} 笔")
+    else:
+        view = table.tail(5)
+        print("\n最近 5 笔：")
+
+    columns = ['sdt', 'direction', 'start_price', 'end_price', 'amplitude', 'bars',
+               'slope', 'max_drawdown', 'pos_in_range', 'amp_ratio']
+    if len(view):
+        view = view[columns]
+        print(view.round({col: 4 for col in view.select_dtypes('number').columns}).to_string())
+
+    print("\n" + "=" * 60)
+    print("分析完成")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+全市场缠论结构面板：按统一交易日历对齐的 股票 × 日期 矩阵
+
+大盘研判经常需要回答市场宽度问题，例如"多少股票最后一笔向上"、"今天多少股票刚出底分型"。
+这个脚本把每个股票的K线和 CZSC 状态对齐到同一个交易日历上，生成稠密矩阵：
+    - close:  收盘价，停牌或未上市为 NaN
+    - bi_dir: 最后一笔方向，1 向上，-1 向下，0 尚无笔
+    - fx:     当天确认的分型，1 顶分型，-1 底分型，0 无
+    - trend:  趋势状态（与 signal_analysis.py 的趋势分析规则一致），
+              1 上升，-1 下降，2 震荡，0 笔数不足
+
+市场宽度统计都是对日期维度的向量化求和。构建面板时逐根K线增量回放每个股票的 CZSC，
+记录每天收盘后 CZSC 实际给出的状态；每日更新时用当天的截面数据继续更新同一个 CZSC 对象
+并追加一列。历史列与每日追加的列口径相同，都不包含之后K线对笔的修正，可以直接比较。
+
+使用方法：
+    # 从历史数据构建面板
+    python market_panel.py --inputs data/*.csv --output panel.npz
+
+    # 用某一交易日的全市场截面数据追加一列（如 pro.daily(trade_date='20240614') 的结果）
+    python market_panel.py --panel panel.npz --update daily_20240614.csv
+
+依赖：
+    pip install czsc pandas numpy
+"""
+
+import argparse
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from czsc import CZSC, RawBar, Freq, Direction
+
+from analyze_czsc_structure import load_data_from_csv, convert_to_raw_bars, convert_to_frame
+
+
+TREND_UNKNOWN, TREND_UP, TREND_DOWN, TREND_RANGE = 0, 1, -1, 2
+
+# 每个 CZSC 对象保留的笔数量：趋势判断只需要最近 5 笔，保留较少的笔使逐K线回放和保存都更快
+PANEL_BI_NUM = 10
+
+FIELDS = {
+    'close': np.float64,
+    'bi_dir': np.int8,
+    'fx': np.int8,
+    'trend': np.int8,
+}
+
+
+def trend_state(bis):
+    """
+    按 signal_analysis.py 中 analyze_trend 的规则判断趋势
+
+    参数：
+        bis: list, 最近的笔（通常为最后 5 笔）
+
+    返回：
+        int: TREND_UP / TREND_DOWN / TREND_RANGE；少于 3 笔或高低点不足时为 TREND_UNKNOWN
+    """
+    if len(bis) < 3:
+        return TREND_UNKNOWN
+    highs = [bi.fx_b.fx for bi in bis if bi.direction == Direction.Up]
+    lows = [bi.fx_b.fx for bi in bis if bi.direction == Direction.Down]
+    if len(highs) < 2 or len(lows) < 2:
+        return TREND_UNKNOWN
+    if highs[-1] > highs[0] and lows[-1] > lows[0]:
+        return TREND_UP
+    if highs[-1] < highs[0] and lows[-1] < lows[0]:
+        return TREND_DOWN
+    return TREND_RANGE
+
+
+def _direction_code(bi):
+    return 1 if bi.direction == Direction.Up else -1
+
+
+def _fx_code(fx):
+    return 1 if '顶' in str(fx.mark) else -1
+
+
+def _confirm_dt(fx):
+    """分型在右侧K线收盘时确认"""
+    return fx.elements[-1].dt
+
+
+def live_state(czsc_obj, dt):
+    """
+    返回 CZSC 对象在 dt 这根K线收盘后的状态
+
+    参数：
+        czsc_obj: CZSC 对象，最后一根K线为 dt
+        dt: datetime, 当前K线时间
+
+    返回：
+        tuple: (最后一笔方向, 趋势状态, 当天确认的分型)，编码与 FIELDS 一致
+    """
+    bis = czsc_obj.bi_list
+    bi_dir = _direction_code(bis[-1]) if bis else 0
+    trend = trend_state(bis[-5:])
+    fx_code = 0
+    for fx in czsc_obj.fx_list[-3:]:
+        if _confirm_dt(fx) == dt:
+            fx_code = _fx_code(fx)
+    return bi_dir, trend, fx_code
+
+
+def symbol_events(filepath):
+    """
+    读取一个股票的历史数据，逐根K线增量回放 CZSC，供进程池调用
+
+    每根K线收盘后记录一次 live_state，与 MarketPanel.append_day 每天写入的状态口径相同。
+
+    返回：
+        dict: 股票代码、K线日期和收盘价、每根K线收盘后的笔方向、趋势和分型，以及回放后的 CZSC 对象
+    """
+    df = load_data_from_csv(filepath)
+    symbol = str(df['ts_code'].iloc[0]) if 'ts_code' in df.columns and len(df) else Path(filepath).stem
+    frame = convert_to_frame(df)
+    raw_bars = convert_to_raw_bars(df.sort_values('trade_date').reset_index(drop=True), symbol)
+
+    n = len(raw_bars)
+    states = np.zeros((n, 3), dtype=np.int8)
+    czsc_obj = None
+    for k, bar in enumerate(raw_bars):
+        if czsc_obj is None:
+            czsc_obj = CZSC([bar], max_bi_num=PANEL_BI_NUM)
+        else:
+            czsc_obj.update(bar)
+        states[k] = live_state(czsc_obj, bar.dt)
+
+    return {
+        'symbol': symbol,
+        'dates': frame['dt'].values.astype('datetime64[ns]'),
+        'close': frame['close'].to_numpy(dtype=np.float64),
+        'bi_dir': states[:, 0],
+        'trend': states[:, 1],
+        'fx': states[:, 2],
+        'czsc': czsc_obj,
+    }
+
+
+class MarketPanel:
+    """
+    股票 × 日期的稠密面板
+
+    各字段矩阵按列预留容量，追加一天时通常只写入一列，容量不足时按 1.5 倍扩容。
+
+    属性：
+        symbols: list, 股票代码，对应矩阵的行
+        dates: ndarray, datetime64 交易日历，对应矩阵的列
+        czsc: dict, {symbol: CZSC 对象}，用于每日增量更新
+    """
+
+    def __init__(self, symbols, dates, czsc=None):
+        self.symbols = list(symbols)
+        self.row = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.n = len(self._dates)
+        self.czsc = czsc or {}
+        self._data = {name: self._empty(len(self.symbols), max(self.n, 1), dtype)
+                      for name, dtype in FIELDS.items()}
+
+    @staticmethod
+    def _empty(rows, cols, dtype):
+        return np.full((rows, cols), np.nan if dtype == np.float64 else 0, dtype=dtype)
+
+    @property
+    def dates(self):
+        return self._dates[:self.n]
+
+    def __getitem__(self, name):
+        """返回字段矩阵的有效部分，形状为 (股票数, 日期数)"""
+        return self._data[name][:, :self.n]
+
+    @classmethod
+    def build(cls, filepaths, calendar=None, workers=None):
+        """
+        从多个股票的历史数据构建面板
+
+        参数：
+            filepaths: list, 每个股票一个 CSV 文件
+            calendar: array-like, 交易日历；默认为所有股票交易日期的并集
+            workers: int, 计算 CZSC 结构的进程数，默认为 CPU 数量
+
+        返回：
+            MarketPanel
+        """
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            events = list(pool.map(symbol_events, filepaths))
+
+        if calendar is None:
+            calendar = np.unique(np.concatenate([e['dates'] for e in events]))
+        calendar = np.asarray(calendar, dtype='datetime64[ns]')
+
+        panel = cls([e['symbol'] for e in events], calendar, czsc={e['symbol']: e['czsc'] for e in events})
+        for i, e in enumerate(events):
+            panel._fill_row(i, e)
+        return panel
+
+    def _fill_row(self, i, e):
+        calendar = self.dates
+        pos = np.searchsorted(calendar, e['dates'])
+        valid = (pos < len(calendar)) & (calendar[np.minimum(pos, len(calendar) - 1)] == e['dates'])
+        self._data['close'][i, pos[valid]] = e['close'][valid]
+        self._data['fx'][i, pos[valid]] = e['fx'][valid]
+
+        if len(e['dates']):
+            # 停牌日沿用最近一个交易日的笔方向和趋势状态，与 append_day 一致
+            idx = np.searchsorted(e['dates'], calendar, side='right') - 1
+            has = idx >= 0
+            self._data['bi_dir'][i, :self.n][has] = e['bi_dir'][idx[has]]
+            self._data['trend'][i, :self.n][has] = e['trend'][idx[has]]
+
+    def _ensure_capacity(self, cols):
+        capacity = self._data['close'].shape[1]
+        if cols <= capacity:
+            return
+        grow = max(cols, int(capacity * 1.5) + 1)
+        for name, dtype in FIELDS.items():
+            arr = self._empty(len(self.symbols), grow, dtype)
+            arr[:, :capacity] = self._data[name]
+            self._data[name] = arr
+        dates = np.empty(grow, dtype='datetime64[ns]')
+        dates[:len(self._dates)] = self._dates
+        self._dates = dates
+
+    def _add_symbol(self, symbol):
+        self.row[symbol] = len(self.symbols)
+        self.symbols.append(symbol)
+        for name, dtype in FIELDS.items():
+            arr = self._data[name]
+            self._data[name] = np.vstack([arr, self._empty(1, arr.shape[1], dtype)])
+        return self.row[symbol]
+
+    def append_day(self, day_df):
+        """
+        用一个交易日的全市场截面数据追加一列
+
+        参数：
+            day_df: DataFrame, 包含 ts_code, trade_date, open, high, low, close, vol, amount 列，
+                只能有一个交易日，且晚于面板最后一天
+        """
+        frame = convert_to_frame(day_df)
+        dt = frame['dt'].iloc[0]
+        if (frame['dt'] != dt).any():
+            raise ValueError("截面数据只能包含一个交易日")
+        if self.n and np.datetime64(dt, 'ns') <= self.dates[-1]:
+            raise ValueError(f"{dt.date()} 不晚于面板最后一天 {pd.Timestamp(self.dates[-1]).date()}")
+
+        j = self.n
+        self._ensure_capacity(j + 1)
+        self._dates[j] = np.datetime64(dt, 'ns')
+        self.n += 1
+        # 没有当天数据的股票沿用前一天的笔方向和趋势状态
+        if j > 0:
+            self._data['bi_dir'][:, j] = self._data['bi_dir'][:, j - 1]
+            self._data['trend'][:, j] = self._data['trend'][:, j - 1]
+
+        symbols = day_df['ts_code'].astype(str).values
+        for k, symbol in enumerate(symbols):
+            row = frame.iloc[k]
+            i = self.row.get(symbol)
+            if i is None:
+                i = self._add_symbol(symbol)
+
+            obj = self.czsc.get(symbol)
+            bar = RawBar(symbol=symbol, dt=dt, freq=Freq.D, open=row['open'], close=row['close'],
+                         high=row['high'], low=row['low'], vol=row['vol'], amount=row['amount'],
+                         id=obj.bars_raw[-1].id + 1 if obj is not None else 0)
+            if obj is None:
+                obj = self.czsc[symbol] = CZSC([bar], max_bi_num=PANEL_BI_NUM)
+            else:
+                obj.update(bar)
+
+            self._data['close'][i, j] = row['close']
+            (self._data['bi_dir'][i, j], self._data['trend'][i, j],
+             self._data['fx'][i, j]) = live_state(obj, bar.dt)
+
+    def save(self, filepath):
+        """保存面板矩阵到 .npz，CZSC 对象保存到同名 .czsc.pkl 文件；每次保存都重写这两个文件"""
+        np.savez_compressed(filepath, symbols=np.array(self.symbols), dates=self.dates,
+                            **{name: self[name] for name in FIELDS})
+        with open(_czsc_path(filepath), 'wb') as f:
+            pickle.dump(self.czsc, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filepath):
+        """加载 save 保存的面板"""
+        data = np.load(filepath, allow_pickle=False)
+        czsc_file = _czsc_path(filepath)
+        czsc = None
+        if czsc_file.exists():
+            with open(czsc_file, 'rb') as f:
+                czsc = pickle.load(f)
+        panel = cls(data['symbols'].tolist(), data['dates'], czsc=czsc)
+        for name in FIELDS:
+            panel._data[name][:, :panel.n] = data[name]
+        return panel
+
+
+def _czsc_path(filepath):
+    filepath = Path(filepath)
+    return filepath.with_name(filepath.stem + '.czsc.pkl')
+
+
+def breadth(panel):
+    """
+    计算每个交易日的市场宽度统计
+
+    返回：
+        DataFrame: 以日期为索引，列为交易股票数、最后一笔向上/向下的数量及占比、
+            当天确认的顶/底分型数量、上升/下降/震荡趋势的数量
+    """
+    active = ~np.isnan(panel['close'])
+    bi_dir, fx, trend = panel['bi_dir'], panel['fx'], panel['trend']
+    n_active = active.sum(axis=0)
+
+    def count(mask):
+        return (mask & active).sum(axis=0)
+
+    stats = pd.DataFrame({
+        'active': n_active,
+        'bi_up': count(bi_dir == 1),
+        'bi_down': count(bi_dir == -1),
+        'top_fx': count(fx == 1),
+        'bottom_fx': count(fx == -1),
+        'trend_up': count(trend == TREND_UP),
+        'trend_down': count(trend == TREND_DOWN),
+        'trend_range': count(trend == TREND_RANGE),
+    }, index=pd.DatetimeIndex(panel.dates, name='dt'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['bi_up_ratio'] = stats['bi_up'] / stats['active']
+    return stats
+
+
+def cross_section(panel, date):
+    """
+    返回某个交易日的截面
+
+    参数：
+        date: str 或 datetime, 交易日
+
+    返回：
+        DataFrame: 以股票代码为索引，列为各字段在该日的取值
+    """
+    j = int(np.searchsorted(panel.dates, np.datetime64(pd.Timestamp(date), 'ns')))
+    if j >= panel.n or panel.dates[j] != np.datetime64(pd.Timestamp(date), 'ns'):
+        raise KeyError(f"面板中没有交易日 {date}")
+    return pd.DataFrame({name: panel[name][:, j] for name in FIELDS}, index=pd.Index(panel.symbols, name='symbol'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='构建全市场缠论结构面板并统计市场宽度')
+    parser.add_argument('--inputs', type=str, nargs='+', help='构建面板：每个股票一个 CSV 文件')
+    parser.add_argument('--output', type=str, default='panel.npz', help='构建面板的输出文件，默认 panel.npz')
+    parser.add_argument('--workers', type=int, help='进程数，默认为 CPU 数量')
+    parser.add_argument('--panel', type=str, help='已有的面板文件')
+    parser.add_argument('--update', type=str, help='追加一天：某一交易日的全市场截面 CSV')
+    parser.add_argument('--days', type=int, default=5, help='显示最近 N 天的市场宽度，默认 5')
+
+    args = parser.parse_args()
+
+    if args.inputs:
+        panel = MarketPanel.build(args.inputs, workers=args.workers)
+        output = args.output
+    elif args.panel:
+        panel = MarketPanel.load(args.panel)
+        output = args.panel
+    else:
+        parser.print_help()
+        return
+
+    if args.update:
+        panel.append_day(load_data_from_csv(args.update))
+
+    if args.inputs or args.update:
+        panel.save(output)
+        print(f"\n面板已保存到 {output}")
+
+    print("\n" + "=" * 60)
+    print("市场宽度")
+    print("=" * 60)
+    print(f"\n股票数量：{len(panel.symbols)}，交易日数量：{panel.n}")
+    print(breadth(panel).tail(args.days).to_string(float_format=lambda x: f"{x:.2%}"))
+
+    print("\n" + "=" * 60)
+    print("分析完成")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
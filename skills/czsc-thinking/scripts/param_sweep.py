@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+并行参数扫描：比较不同 CZSC 参数和信号规则参数的效果
+
+这个脚本对一组股票、一张参数网格做批量评估：
+    - 每个股票的数据只解析一次，所有参数组合共享同一份 RawBar
+    - 每组 CZSC 参数逐根K线增量回放一次，记录背驰在实时笔序列中出现的时刻，
+      所有信号规则参数在这些记录上评估，不使用事后确定的笔终点
+    - CZSC 参数组合通过进程池并行计算
+    - 按股票分批评估，每批结束后提前淘汰明显较差的参数组合
+
+信号规则与 signal_analysis.py 的背驰判断一致：同向两笔中，后一笔创新高（新低）
+且幅度小于前一笔幅度的 amp_ratio 倍，视为背驰，在信号出现的K线收盘入场，
+持有 hold_bars 根K线计算收益。
+
+输出为结果立方体（股票 × 参数组合 × 指标），保存为 .npz 文件。
+
+使用方法：
+    python param_sweep.py --inputs data/*.csv
+    python param_sweep.py --inputs data/*.csv \\
+        --czsc_grid "min_bi_len=5,6,7" --signal_grid "amp_ratio=0.8,1.0;hold_bars=5,10,20"
+
+依赖：
+    pip install czsc pandas numpy
+"""
+
+import argparse
+import inspect
+import itertools
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from czsc import CZSC, Direction
+
+from analyze_czsc_structure import load_data_from_csv, convert_to_raw_bars
+
+
+METRICS = ['bi_count', 'mean_amp', 'signals', 'hit_rate', 'mean_ret']
+
+# CZSC 构造函数不接受时改用环境变量传给 czsc 的参数
+CZSC_ENV_PARAMS = {
+    'min_bi_len': 'czsc_min_bi_len',
+}
+
+# 取值必须为整数的参数，网格中写成 5.0 也按整数处理
+INT_PARAMS = {'min_bi_len', 'max_bi_num', 'hold_bars'}
+
+# 逐K线回放时 CZSC 保留的笔数量：背驰只需要最近三笔，保留全部历史会拖慢每根K线读取 bi_list
+REPLAY_BI_NUM = 10
+
+# 工作进程共享的K线数据，由 _init_worker 设置
+_BARS = {}
+
+
+def parse_grid(text):
+    """
+    解析参数网格
+
+    参数：
+        text: str, 形如 'min_bi_len=5,6,7;max_bi_num=50,100'
+
+    返回：
+        list: 参数字典列表，为各参数取值的笛卡尔积
+    """
+    if not text:
+        return [{}]
+    keys, values = [], []
+    for item in text.split(';'):
+        key, sep, raw = item.partition('=')
+        key = key.strip()
+        if not key or not sep or not raw.strip():
+            raise ValueError(f"参数网格格式错误：'{item}'，应为 '参数=取值1,取值2'")
+        keys.append(key)
+        values.append([_parse_value(key, v.strip()) for v in raw.split(',')])
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def _parse_value(key, text):
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"参数 {key} 的取值无法解析：'{text}'") from None
+
+
+def load_symbols(filepaths):
+    """
+    加载多个 CSV 文件，每个文件只解析一次
+
+    股票代码优先取 ts_code 列，否则取文件名。
+
+    返回：
+        dict: {symbol: RawBar 列表}
+    """
+    bars = {}
+    for filepath in filepaths:
+        df = load_data_from_csv(filepath)
+        if 'ts_code' in df.columns and len(df):
+            symbol = str(df['ts_code'].iloc[0])
+        else:
+            symbol = Path(filepath).stem
+        df = df.sort_values('trade_date').reset_index(drop=True)
+        bars[symbol] = convert_to_raw_bars(df, symbol)
+    return bars
+
+
+def czsc_param_names():
+    """返回已安装的 czsc 中 CZSC 构造函数接受的参数名"""
+    try:
+        names = set(inspect.signature(CZSC).parameters)
+    except (TypeError, ValueError):
+        names = set()
+    return names - {'bars_raw'}
+
+
+def check_czsc_grid(czsc_grid):
+    """
+    检查 CZSC 参数网格中的参数是否被已安装的 czsc 支持
+
+    不支持的参数不会影响结果，只会产生重复的参数组合，因此直接报错。
+    """
+    supported = czsc_param_names() | set(CZSC_ENV_PARAMS)
+    unknown = sorted({key for params in czsc_grid for key in params} - supported)
+    if unknown:
+        raise ValueError(f"已安装的 czsc 不支持以下 CZSC 参数：{', '.join(unknown)}；"
+                         f"可用参数：{', '.join(sorted(supported))}")
+
+
+def check_signal_grid(signal_grid):
+    """检查信号参数网格中的参数是否为 evaluate_signals 的参数"""
+    supported = set(inspect.signature(evaluate_signals).parameters) - {'events', 'closes'}
+    unknown = sorted({key for params in signal_grid for key in params} - supported)
+    if unknown:
+        raise ValueError(f"不支持以下信号参数：{', '.join(unknown)}；"
+                         f"可用参数：{', '.join(sorted(supported))}")
+
+
+def cast_int_params(grid):
+    """
+    把网格中 INT_PARAMS 的取值转换为整数
+
+    异常：
+        ValueError: 取值不是整数，如 hold_bars=5.5
+    """
+    for params in grid:
+        for key in INT_PARAMS & set(params):
+            value = params[key]
+            if value != int(value):
+                raise ValueError(f"参数 {key} 必须为整数：{value}")
+            params[key] = int(value)
+    return grid
+
+
+def build_czsc(raw_bars, czsc_params, max_bi_num=None):
+    """按参数构建 CZSC 对象，max_bi_num 默认保留全部历史笔"""
+    names = czsc_param_names()
+    for key, env in CZSC_ENV_PARAMS.items():
+        if key in czsc_params and key not in names:
+            os.environ[env] = str(czsc_params[key])
+        else:
+            os.environ.pop(env, None)
+    kwargs = {k: v for k, v in czsc_params.items() if k in names}
+    kwargs.setdefault('max_bi_num', max_bi_num or len(raw_bars))
+    return CZSC(raw_bars, **kwargs)
+
+
+def _amplitude(bi):
+    return abs(bi.fx_b.fx - bi.fx_a.fx)
+
+
+def replay_signals(raw_bars, czsc_params):
+    """
+    逐根K线增量更新 CZSC，记录背驰在实时笔序列中出现的时刻
+
+    最后一笔每变化一次（延伸、新笔出现或被撤销）都记录一个候选状态，判断只使用当时已有的K线，
+    与实盘中逐根K线运行 CZSC 看到的结果一致；完整历史构建的笔序列中，
+    笔的终点是事后确定的，不能用于评估信号。
+
+    参数：
+        raw_bars: list, RawBar 列表
+        czsc_params: dict, CZSC 参数
+
+    返回：
+        list: (K线下标, 背驰笔开始时间, 方向, 后一笔与前一同向笔的幅度比)，
+            方向 1 为做多（向下笔背驰），-1 为做空（向上笔背驰）
+    """
+    czsc_obj = build_czsc(raw_bars[:1], czsc_params, max_bi_num=REPLAY_BI_NUM)
+    events = []
+    last_state = None
+    for k in range(1, len(raw_bars)):
+        czsc_obj.update(raw_bars[k])
+        bis = czsc_obj.bi_list
+        if not bis:
+            continue
+        bi2 = bis[-1]
+        state = (bi2.fx_a.dt, bi2.fx_b.dt)
+        if state == last_state:
+            continue
+        last_state = state
+
+        if len(bis) < 3:
+            continue
+        bi1 = bis[-3]
+        amp1 = _amplitude(bi1)
+        if not amp1:
+            continue
+        if bi2.direction == Direction.Up and bi2.fx_b.fx > bi1.fx_b.fx:
+            side = -1
+        elif bi2.direction == Direction.Down and bi2.fx_b.fx < bi1.fx_b.fx:
+            side = 1
+        else:
+            continue
+        events.append((k, bi2.fx_a.dt, side, _amplitude(bi2) / amp1))
+    return events
+
+
+def evaluate_signals(events, closes, amp_ratio=1.0, hold_bars=10):
+    """
+    评估背驰信号
+
+    每一笔只在第一次满足背驰条件时产生一次信号，在当根K线收盘入场。
+
+    参数：
+        events: list, replay_signals 返回的背驰候选
+        closes: list, 收盘价序列
+        amp_ratio: float, 后一笔幅度小于前一同向笔幅度的该倍数时视为背驰
+        hold_bars: int, 信号出现后的持有K线数量
+
+    返回：
+        tuple: (信号数量, 胜率, 平均收益)
+    """
+    returns = []
+    signaled = set()
+    for entry, key, side, ratio in events:
+        if key in signaled or ratio >= amp_ratio:
+            continue
+        signaled.add(key)
+        if entry + hold_bars >= len(closes):
+            continue
+        returns.append(side * (closes[entry + hold_bars] / closes[entry] - 1))
+
+    if not returns:
+        return 0, np.nan, np.nan
+    returns = np.asarray(returns)
+    return len(returns), float((returns > 0).mean()), float(returns.mean())
+
+
+def _init_worker(bars):
+    global _BARS
+    _BARS = bars
+
+
+def _run_czsc_point(czsc_params, signal_grid, symbols):
+    """
+    在工作进程中评估一组 CZSC 参数
+
+    返回：
+        ndarray: 形状为 (len(symbols), len(signal_grid), len(METRICS)) 的结果
+    """
+    result = np.full((len(symbols), len(signal_grid), len(METRICS)), np.nan)
+    for i, symbol in enumerate(symbols):
+        raw_bars = _BARS[symbol]
+        if not raw_bars:
+            continue
+        events = replay_signals(raw_bars, czsc_params)
+        closes = [bar.close for bar in raw_bars]
+
+        # 笔数量和平均幅度是结构统计，不涉及入场时机，用一次性构建的完整笔序列计算
+        bis = build_czsc(raw_bars, czsc_params).bi_list
+        amps = [abs(bi.fx_b.fx / bi.fx_a.fx - 1) for bi in bis if bi.fx_a.fx]
+        mean_amp = float(np.mean(amps)) if amps else np.nan
+
+        for j, signal_params in enumerate(signal_grid):
+            signals, hit_rate, mean_ret = evaluate_signals(events, closes, **signal_params)
+            result[i, j] = [len(bis), mean_amp, signals, hit_rate, mean_ret]
+    return result
+
+
+def run_sweep(bars, czsc_grid, signal_grid, workers=None, stages=3, keep=0.5, objective='mean_ret'):
+    """
+    执行参数扫描
+
+    股票按 stages 批依次评估，每批结束后只保留目标指标排名前 keep 比例的参数组合，
+    被淘汰组合在后续批次股票上的结果保持为 NaN。
+
+    参数：
+        bars: dict, {symbol: RawBar 列表}
+        czsc_grid: list, CZSC 参数字典列表
+        signal_grid: list, 信号规则参数字典列表
+        workers: int, 进程数，默认为 CPU 数量
+        stages: int, 提前淘汰的批次数，1 表示不淘汰
+        keep: float, 每批保留的参数组合比例
+        objective: str, 用于淘汰的指标，越大越好
+
+    返回：
+        tuple: (cube, symbols, params, alive)；cube 形状为 (股票数, 参数组合数, 指标数)，
+            params 为 (czsc_params, signal_params) 列表，顺序与 cube 第二维一致，
+            alive 为布尔数组，标记评估完全部股票、未被淘汰的参数组合
+    """
+    symbols = list(bars)
+    params = [(c, s) for c in czsc_grid for s in signal_grid]
+    cube = np.full((len(symbols), len(params), len(METRICS)), np.nan)
+    alive = np.ones((len(czsc_grid), len(signal_grid)), dtype=bool)
+    metric = METRICS.index(objective)
+
+    workers = workers or os.cpu_count() or 1
+    batches = np.array_split(np.arange(len(symbols)), max(1, stages))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bars,)) as pool:
+        for stage, batch in enumerate(batches):
+            if not len(batch):
+                continue
+            points = [k for k in range(len(czsc_grid)) if alive[k].any()]
+
+            # 每组 CZSC 参数再按股票切块，保证参数组合较少时也能用满所有进程
+            n_chunks = min(len(batch), max(1, workers // len(points)))
+            futures = []
+            for k in points:
+                for chunk in np.array_split(batch, n_chunks):
+                    chunk_symbols = [symbols[i] for i in chunk]
+                    futures.append((k, chunk, pool.submit(_run_czsc_point, czsc_grid[k],
+                                                          signal_grid, chunk_symbols)))
+            for k, chunk, future in futures:
+                block = future.result()
+                block[:, ~alive[k]] = np.nan
+                cols = slice(k * len(signal_grid), (k + 1) * len(signal_grid))
+                cube[chunk, cols] = block
+
+            print(f"第 {stage + 1}/{len(batches)} 批完成：{len(batch)} 只股票，"
+                  f"{int(alive.sum())} 个参数组合")
+
+            if stage < len(batches) - 1:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    score = np.nanmean(cube[:, :, metric], axis=0).reshape(alive.shape)
+                score = np.where(alive & ~np.isnan(score), score, -np.inf)
+                n_keep = max(1, int(np.ceil(alive.sum() * keep)))
+                threshold = np.sort(score, axis=None)[::-1][n_keep - 1]
+                alive &= score >= threshold
+
+    return cube, symbols, params, alive.ravel()
+
+
+def summarize(cube, params, objective='mean_ret', alive=None):
+    """
+    把结果立方体按股票维度取平均，汇总为 DataFrame
+
+    被淘汰的参数组合只在前几批股票上取平均，与评估完全部股票的组合不可直接比较，
+    因此排在未淘汰组合之后。
+
+    参数：
+        cube: ndarray, run_sweep 返回的结果立方体
+        params: list, run_sweep 返回的参数组合列表
+        objective: str, 排序依据的指标
+        alive: ndarray, run_sweep 返回的未淘汰标记，默认全部视为未淘汰
+
+    返回：
+        DataFrame: 每行一个参数组合，alive 列标记是否未被淘汰；
+            先按 alive、再按目标指标降序排列
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(cube, axis=0)
+    evaluated = (~np.isnan(cube[:, :, METRICS.index(objective)])).sum(axis=0)
+    rows = []
+    for (czsc_params, signal_params), values, count in zip(params, mean, evaluated):
+        row = {**czsc_params, **signal_params}
+        row.update(dict(zip(METRICS, values)))
+        row['symbols'] = int(count)
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    df['alive'] = np.ones(len(params), dtype=bool) if alive is None else np.asarray(alive, dtype=bool)
+    return df.sort_values(['alive', objective], ascending=False, na_position='last')
+
+
+def save_cube(filepath, cube, symbols, params, alive):
+    """把结果立方体保存为 .npz，参数组合以 JSON 字符串保存"""
+    np.savez_compressed(
+        filepath,
+        cube=cube,
+        symbols=np.array(symbols),
+        params=np.array([json.dumps({'czsc': c, 'signal': s}) for c, s in params]),
+        metrics=np.array(METRICS),
+        alive=np.asarray(alive, dtype=bool),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行扫描 CZSC 参数和信号规则参数')
+    parser.add_argument('--inputs', type=str, nargs='+', required=True, help='输入数据文件（CSV格式），可多个')
+    parser.add_argument('--czsc_grid', type=str, default='min_bi_len=5,6,7',
+                        help="CZSC 参数网格，默认 'min_bi_len=5,6,7'")
+    parser.add_argument('--signal_grid', type=str, default='amp_ratio=0.8,1.0;hold_bars=5,10,20',
+                        help="信号规则参数网格，默认 'amp_ratio=0.8,1.0;hold_bars=5,10,20'")
+    parser.add_argument('--workers', type=int, help='进程数，默认为 CPU 数量')
+    parser.add_argument('--stages', type=int, default=3, help='提前淘汰的批次数，1 表示不淘汰，默认 3')
+    parser.add_argument('--keep', type=float, default=0.5, help='每批保留的参数组合比例，默认 0.5')
+    parser.add_argument('--objective', type=str, default='mean_ret', choices=METRICS, help='淘汰依据的指标')
+    parser.add_argument('--output', type=str, default='sweep_results.npz', help='结果立方体输出文件')
+    parser.add_argument('--top', type=int, default=10, help='显示排名前 N 的参数组合，默认 10')
+
+    args = parser.parse_args()
+
+    # 参数网格在加载数据之前检查，错误不会等到工作进程中才暴露
+    try:
+        czsc_grid = cast_int_params(parse_grid(args.czsc_grid))
+        signal_grid = cast_int_params(parse_grid(args.signal_grid))
+        check_czsc_grid(czsc_grid)
+        check_signal_grid(signal_grid)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # 每个股票只解析一次
+    bars = load_symbols(args.inputs)
+
+    print("\n" + "=" * 60)
+    print("参数扫描")
+    print("=" * 60)
+    print(f"股票数量：{len(bars)}")
+    print(f"参数组合：{len(czsc_grid)} 组 CZSC 参数 × {len(signal_grid)} 组信号参数")
+
+    cube, symbols, params, alive = run_sweep(bars, czsc_grid, signal_grid, workers=args.workers,
+                                             stages=args.stages, keep=args.keep, objective=args.objective)
+    save_cube(args.output, cube, symbols, params, alive)
+
+    print(f"\n排名前 {args.top} 的参数组合：")
+    print(summarize(cube, params, args.objective, alive).head(args.top).to_string(index=False))
+    print(f"\n结果立方体已保存到 {args.output}（形状：{cube.shape}）")
+
+    print("\n" + "=" * 60)
+    print("扫描完成")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,494 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+批量绘制缠论结构图（K线 + 分型 + 笔 + 线段）
+
+这个脚本把 analyze_czsc_structure.py 打印的结构画成静态 HTML 或 PNG 图表。
+长历史数据（如几十年的分钟K线）在绘图前按输出像素宽度降采样：
+    - K线：按像素宽度分桶做 OHLC 聚合（开盘取首、收盘取尾、最高取最大、最低取最小），
+      每个像素最多一根K线，视觉上无损
+    - 笔、线段：用 LTTB（Largest-Triangle-Three-Buckets）算法保留折线形状
+    - 分型：每个桶只保留最高的顶分型和最低的底分型
+
+线段优先使用 CZSC 对象的 xd_list；当前 czsc 的 CZSC 对象没有 xd_list，
+由 find_xd 按特征序列从笔序列划分。
+
+多个股票通过进程池并行渲染。
+
+使用方法：
+    python render_charts.py --inputs data/*.csv --output_dir charts
+    python render_charts.py --inputs data/*.csv --format png --width 1600
+    python render_charts.py --benchmark 1000000
+
+依赖：
+    pip install czsc pandas numpy plotly
+    pip install matplotlib  # 输出 PNG 时需要
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from czsc import CZSC, RawBar, Freq, Direction
+
+from analyze_czsc_structure import load_data_from_csv, convert_to_raw_bars, convert_to_frame
+
+
+def ohlc_downsample(dt, open_, high, low, close, width):
+    """
+    按像素宽度对K线做 OHLC 聚合
+
+    参数：
+        dt: ndarray, datetime64 时间
+        open_, high, low, close: ndarray, 价格序列
+        width: int, 目标K线数量（通常为图表像素宽度）
+
+    返回：
+        tuple: 聚合后的 (dt, open, high, low, close)，时间取每个桶的最后一根K线
+    """
+    n = len(dt)
+    if n <= width:
+        return dt, open_, high, low, close
+    size = int(np.ceil(n / width))
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+    return (
+        dt[ends],
+        open_[starts],
+        np.maximum.reduceat(high, starts),
+        np.minimum.reduceat(low, starts),
+        close[ends],
+    )
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 折线降采样
+
+    参数：
+        x: ndarray, 横坐标（数值类型，时间需先转为整数）
+        y: ndarray, 纵坐标
+        threshold: int, 目标点数，不少于 3
+
+    返回：
+        ndarray: 被保留点的下标
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def fx_downsample(dt, price, is_top, width, start, end):
+    """
+    分型降采样：把时间轴等分为 width 个桶，每个桶只保留最高的顶分型和最低的底分型
+
+    返回：
+        tuple: (dt, price, is_top)
+    """
+    if len(dt) <= width:
+        return dt, price, is_top
+    t = dt.astype('datetime64[ns]').astype(np.int64)
+    span = max(1, int(end) - int(start))
+    bucket = np.minimum((t - int(start)) * width // span, width - 1)
+
+    keep = []
+    for flag, sign in ((True, 1), (False, -1)):
+        idx = np.flatnonzero(is_top == flag)
+        if not len(idx):
+            continue
+        # 按 (桶, 价格) 排序后取每个桶的第一个，即顶分型取最高、底分型取最低
+        order = idx[np.lexsort((-sign * price[idx], bucket[idx]))]
+        first = np.concatenate(([True], bucket[order][1:] != bucket[order][:-1]))
+        keep.append(order[first])
+    keep = np.sort(np.concatenate(keep)) if keep else np.array([], dtype=np.int64)
+    return dt[keep], price[keep], is_top[keep]
+
+
+def find_xd(bi_list):
+    """
+    用特征序列从笔序列划分线段
+
+    向上线段的特征序列为其中的向下笔，按向上方向做包含处理后出现顶分型时，
+    线段在顶分型中间元素的起点结束，下一线段从该点开始；向下线段反之。
+    线段完成前若出现低于（高于）线段起点的价格，前一线段延伸到这个新的极值，
+    新线段从这里重新开始。简化处理：不区分特征序列有缺口的第二种情况。
+
+    参数：
+        bi_list: list, CZSC 对象的 bi_list
+
+    返回：
+        list: (起点分型, 终点分型) 列表；最后一个未完成的线段以其中的极值为终点
+    """
+    n = len(bi_list)
+    if n < 3:
+        return []
+    up = [bi.direction == Direction.Up for bi in bi_list]
+    high = [max(bi.fx_a.fx, bi.fx_b.fx) for bi in bi_list]
+    low = [min(bi.fx_a.fx, bi.fx_b.fx) for bi in bi_list]
+
+    segments = []
+    start, feats = 0, []
+    j = 1
+    while j < n:
+        seg_up = up[start]
+        if up[j] == seg_up:
+            j += 1
+            continue
+
+        origin = bi_list[start].fx_a.fx
+        if (seg_up and low[j] < origin) or (not seg_up and high[j] > origin):
+            # 起点被突破：前一线段延伸到第 j 笔的终点，新线段从下一笔开始
+            if segments:
+                segments[-1][1] = j
+            start, feats = j + 1, []
+            j = start + 1
+            continue
+
+        # 特征序列元素 [高点, 低点, 笔下标]，包含关系按线段方向合并，保留极值所在的笔
+        item = [high[j], low[j], j]
+        if feats:
+            last = feats[-1]
+            if (last[0] >= item[0] and last[1] <= item[1]) or (item[0] >= last[0] and item[1] <= last[1]):
+                if seg_up:
+                    keep = last[2] if last[0] >= item[0] else item[2]
+                    item = [max(last[0], item[0]), max(last[1], item[1]), keep]
+                else:
+                    keep = last[2] if last[1] <= item[1] else item[2]
+                    item = [min(last[0], item[0]), min(last[1], item[1]), keep]
+                feats.pop()
+        feats.append(item)
+
+        if len(feats) >= 3:
+            a, b, c = feats[-3:]
+            if (seg_up and b[0] > a[0] and b[0] > c[0]) or (not seg_up and b[1] < a[1] and b[1] < c[1]):
+                segments.append([start, b[2] - 1])
+                start, feats = b[2], []
+                j = start + 1
+                continue
+        j += 1
+
+    if start < n:
+        # 未完成的线段：终点取同向笔中的极值，至少三笔
+        ends = range(start, n, 2)
+        end = max(ends, key=lambda k: bi_list[k].fx_b.fx) if up[start] else \
+            min(ends, key=lambda k: bi_list[k].fx_b.fx)
+        if end - start >= 2:
+            segments.append([start, end])
+    return [(bi_list[s].fx_a, bi_list[e].fx_b) for s, e in segments]
+
+
+def _to_datetime64(values):
+    """把 datetime / Timestamp 列表转换为 datetime64[ns] 数组"""
+    return pd.DatetimeIndex(values).values.astype('datetime64[ns]')
+
+
+def extract_structure(czsc_obj, bars=None):
+    """
+    从 CZSC 对象提取绘图所需的数组
+
+    参数：
+        czsc_obj: CZSC 对象
+        bars: DataFrame, 可选，convert_to_frame 的结果；不传时从 czsc_obj.bars_raw 读取
+
+    返回：
+        dict: bars（dt, open, high, low, close）、fx（dt, price, is_top）、bi 和 xd 折线（dt, price）
+    """
+    if bars is None:
+        raw = czsc_obj.bars_raw
+        bars = pd.DataFrame({
+            'dt': [bar.dt for bar in raw],
+            'open': [bar.open for bar in raw],
+            'high': [bar.high for bar in raw],
+            'low': [bar.low for bar in raw],
+            'close': [bar.close for bar in raw],
+        })
+    data = {'dt': _to_datetime64(bars['dt'])}
+    for col in ('open', 'high', 'low', 'close'):
+        data[col] = bars[col].to_numpy(dtype=np.float64)
+
+    fx_list = czsc_obj.fx_list
+    data['fx_dt'] = _to_datetime64([fx.dt for fx in fx_list])
+    data['fx_price'] = np.array([fx.fx for fx in fx_list], dtype=np.float64)
+    data['fx_top'] = np.array(['顶' in str(fx.mark) for fx in fx_list], dtype=bool)
+
+    def polyline(items, start, end):
+        if not items:
+            return np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float64)
+        points = [start(items[0])] + [end(item) for item in items]
+        return (_to_datetime64([p.dt for p in points]),
+                np.array([p.fx for p in points], dtype=np.float64))
+
+    bi_list = czsc_obj.bi_list
+    data['bi_dt'], data['bi_price'] = polyline(bi_list, lambda bi: bi.fx_a, lambda bi: bi.fx_b)
+    # 当前 czsc 的 CZSC 对象没有 xd_list，线段由笔序列按特征序列划分
+    xd_list = getattr(czsc_obj, 'xd_list', None)
+    xd = [(x.start, x.end) for x in xd_list] if xd_list else find_xd(bi_list)
+    data['xd_dt'], data['xd_price'] = polyline(xd, lambda x: x[0], lambda x: x[1])
+    return data
+
+
+def downsample_structure(data, width):
+    """把 extract_structure 的结果降采样到指定像素宽度"""
+    out = {}
+    (out['dt'], out['open'], out['high'],
+     out['low'], out['close']) = ohlc_downsample(data['dt'], data['open'], data['high'],
+                                                  data['low'], data['close'], width)
+
+    if len(data['dt']):
+        start = data['dt'][0].astype(np.int64)
+        end = data['dt'][-1].astype(np.int64)
+    else:
+        start = end = 0
+    out['fx_dt'], out['fx_price'], out['fx_top'] = fx_downsample(
+        data['fx_dt'], data['fx_price'], data['fx_top'], width, start, end)
+
+    for key in ('bi', 'xd'):
+        dt, price = data[f'{key}_dt'], data[f'{key}_price']
+        keep = lttb(dt.astype(np.int64), price, width)
+        out[f'{key}_dt'], out[f'{key}_price'] = dt[keep], price[keep]
+    return out
+
+
+def render_html(data, title, filepath, height=600, offline=False):
+    """用 plotly 输出交互式 HTML"""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(x=data['dt'], open=data['open'], high=data['high'], low=data['low'],
+                                 close=data['close'], name='K线',
+                                 increasing_line_color='#e74c3c', decreasing_line_color='#2ecc71'))
+    top, bottom = data['fx_top'], ~data['fx_top']
+    fig.add_trace(go.Scatter(x=data['fx_dt'][top], y=data['fx_price'][top], mode='markers', name='顶分型',
+                             marker=dict(symbol='triangle-down', size=6, color='#8e44ad')))
+    fig.add_trace(go.Scatter(x=data['fx_dt'][bottom], y=data['fx_price'][bottom], mode='markers', name='底分型',
+                             marker=dict(symbol='triangle-up', size=6, color='#2980b9')))
+    fig.add_trace(go.Scatter(x=data['bi_dt'], y=data['bi_price'], mode='lines', name='笔',
+                             line=dict(color='#f39c12', width=1.5)))
+    if len(data['xd_dt']):
+        fig.add_trace(go.Scatter(x=data['xd_dt'], y=data['xd_price'], mode='lines', name='线段',
+                                 line=dict(color='#34495e', width=2.5)))
+    fig.update_layout(title=title, height=height, xaxis_rangeslider_visible=False,
+                      template='plotly_white', margin=dict(l=40, r=20, t=50, b=30))
+    fig.write_html(filepath, include_plotlyjs=True if offline else 'cdn')
+
+
+CJK_FONTS = ['SimHei', 'Microsoft YaHei', 'PingFang SC', 'Noto Sans CJK SC', 'Source Han Sans SC',
+             'WenQuanYi Micro Hei', 'Arial Unicode MS']
+
+ASCII_LABELS = {'顶分型': 'Top FX', '底分型': 'Bottom FX', '笔': 'Bi', '线段': 'XD'}
+
+
+def _cjk_font():
+    """返回 matplotlib 中可用的第一个中文字体名，没有则返回 None"""
+    from matplotlib import font_manager
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    return next((name for name in CJK_FONTS if name in installed), None)
+
+
+def render_png(data, title, filepath, width=1600, height=600, ascii_title=None):
+    """
+    用 matplotlib 输出静态 PNG
+
+    标题和图例中的"顶分型"、"日线"等需要中文字体；没有安装中文字体时改用英文标注，
+    标题使用 ascii_title，避免输出方框字符。
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    font = _cjk_font()
+    if font is not None:
+        plt.rcParams['font.sans-serif'] = [font, 'DejaVu Sans']
+        labels = {name: name for name in ASCII_LABELS}
+    else:
+        labels = ASCII_LABELS
+        title = ascii_title or title.encode('ascii', 'ignore').decode().strip()
+    plt.rcParams['axes.unicode_minus'] = False
+
+    dpi = 100
+    fig, ax = plt.subplots(figsize=(width / dpi, height / dpi), dpi=dpi)
+    x = data['dt']
+    up = data['close'] >= data['open']
+    for mask, color in ((up, '#e74c3c'), (~up, '#2ecc71')):
+        ax.vlines(x[mask], data['low'][mask], data['high'][mask], color=color, linewidth=0.5)
+        ax.vlines(x[mask], data['open'][mask], data['close'][mask], color=color, linewidth=2)
+
+    top, bottom = data['fx_top'], ~data['fx_top']
+    ax.scatter(data['fx_dt'][top], data['fx_price'][top], marker='v', s=10, color='#8e44ad',
+               label=labels['顶分型'])
+    ax.scatter(data['fx_dt'][bottom], data['fx_price'][bottom], marker='^', s=10, color='#2980b9',
+               label=labels['底分型'])
+    ax.plot(data['bi_dt'], data['bi_price'], color='#f39c12', linewidth=1, label=labels['笔'])
+    if len(data['xd_dt']):
+        ax.plot(data['xd_dt'], data['xd_price'], color='#34495e', linewidth=2, label=labels['线段'])
+
+    ax.set_title(title)
+    ax.legend(loc='upper left')
+    ax.grid(alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(filepath)
+    plt.close(fig)
+
+
+def render_czsc(czsc_obj, filepath, fmt='html', width=1600, height=600, offline=False, bars=None):
+    """
+    把一个 CZSC 对象渲染为图表文件
+
+    参数：
+        bars: DataFrame, 可选，convert_to_frame 的结果，传入时不再逐根读取 czsc_obj.bars_raw
+
+    返回：
+        dict: 原始K线数量、绘制K线数量、渲染耗时（秒）和文件大小（字节）
+    """
+    start = time.perf_counter()
+    data = extract_structure(czsc_obj, bars)
+    small = downsample_structure(data, width)
+    title = f"{czsc_obj.symbol} {czsc_obj.freq}"
+    if fmt == 'png':
+        ascii_title = f"{czsc_obj.symbol} {getattr(czsc_obj.freq, 'name', '')}".strip()
+        render_png(small, title, filepath, width=width, height=height, ascii_title=ascii_title)
+    else:
+        render_html(small, title, filepath, height=height, offline=offline)
+    return {
+        'bars': len(data['dt']),
+        'drawn_bars': len(small['dt']),
+        'seconds': time.perf_counter() - start,
+        'size': os.path.getsize(filepath),
+    }
+
+
+def render_file(filepath, output_dir, fmt='html', width=1600, height=600, offline=False):
+    """读取一个 CSV 文件、计算缠论结构并渲染，供进程池调用"""
+    df = load_data_from_csv(filepath)
+    symbol = str(df['ts_code'].iloc[0]) if 'ts_code' in df.columns and len(df) else Path(filepath).stem
+    df = df.sort_values('trade_date').reset_index(drop=True)
+    raw_bars = convert_to_raw_bars(df, symbol)
+    czsc_obj = CZSC(raw_bars, max_bi_num=len(raw_bars))
+
+    output = Path(output_dir) / f"{symbol.replace('.', '_')}.{fmt}"
+    stats = render_czsc(czsc_obj, str(output), fmt=fmt, width=width, height=height,
+                        offline=offline, bars=convert_to_frame(df))
+    stats['symbol'] = symbol
+    stats['output'] = str(output)
+    return stats
+
+
+def render_batch(filepaths, output_dir, fmt='html', width=1600, height=600, offline=False, workers=None):
+    """
+    并行渲染多个股票
+
+    返回：
+        list: 每个股票的渲染统计
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_file, fp, output_dir, fmt, width, height, offline) for fp in filepaths]
+        return [future.result() for future in futures]
+
+
+def make_random_bars(n, symbol='BENCH', seed=0):
+    """
+    生成 n 根随机游走的 1 分钟K线，用于基准测试
+
+    返回：
+        tuple: (RawBar 列表, convert_to_frame 格式的 DataFrame)
+    """
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.concatenate(([10.0], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.001, n)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    dts = pd.date_range('2000-01-03 09:31', periods=n, freq='min')
+    raw_bars = [RawBar(symbol=symbol, dt=dts[i], freq=Freq.F1, open=open_[i], close=close[i],
+                       high=high[i], low=low[i], vol=1000.0, amount=close[i] * 1000, id=i)
+                for i in range(n)]
+    bars = pd.DataFrame({'dt': dts, 'open': open_, 'close': close, 'high': high, 'low': low,
+                         'vol': 1000.0, 'amount': close * 1000})
+    return raw_bars, bars
+
+
+def run_benchmark(n, output_dir, width=1600, height=600):
+    """在 n 根K线上测量结构计算时间、各格式的渲染时间和文件大小"""
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    print(f"正在生成 {n} 根K线...")
+    raw_bars, bars = make_random_bars(n)
+
+    start = time.perf_counter()
+    czsc_obj = CZSC(raw_bars, max_bi_num=len(raw_bars))
+    print(f"CZSC 结构计算：{time.perf_counter() - start:.2f} 秒，"
+          f"分型 {len(czsc_obj.fx_list)} 个，笔 {len(czsc_obj.bi_list)} 笔")
+
+    for fmt in ('html', 'png'):
+        filepath = str(Path(output_dir) / f"benchmark_{n}.{fmt}")
+        try:
+            stats = render_czsc(czsc_obj, filepath, fmt=fmt, width=width, height=height, bars=bars)
+        except ImportError as e:
+            print(f"{fmt.upper()} 渲染跳过：{e}")
+            continue
+        print(f"{fmt.upper()} 渲染：{stats['seconds']:.2f} 秒，绘制 {stats['drawn_bars']} 根K线，"
+              f"文件大小 {stats['size'] / 1024:.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量绘制缠论结构图')
+    parser.add_argument('--inputs', type=str, nargs='+', help='输入数据文件（CSV格式），可多个')
+    parser.add_argument('--output_dir', type=str, default='charts', help='输出目录，默认 charts')
+    parser.add_argument('--format', type=str, default='html', choices=['html', 'png'], help='输出格式，默认 html')
+    parser.add_argument('--width', type=int, default=1600, help='图表像素宽度，也是降采样目标点数，默认 1600')
+    parser.add_argument('--height', type=int, default=600, help='图表像素高度，默认 600')
+    parser.add_argument('--offline', action='store_true', help='HTML 内嵌 plotly.js，可离线打开（文件约增大 3MB）')
+    parser.add_argument('--workers', type=int, help='进程数，默认为 CPU 数量')
+    parser.add_argument('--benchmark', type=int, help='基准测试：在指定数量的随机K线上测量渲染时间和文件大小')
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print("\n" + "=" * 60)
+        print("渲染基准测试")
+        print("=" * 60)
+        run_benchmark(args.benchmark, args.output_dir, width=args.width, height=args.height)
+        return
+
+    if not args.inputs:
+        parser.print_help()
+        return
+
+    print("\n" + "=" * 60)
+    print("批量绘制缠论结构图")
+    print("=" * 60)
+    results = render_batch(args.inputs, args.output_dir, fmt=args.format, width=args.width,
+                           height=args.height, offline=args.offline, workers=args.workers)
+    for r in results:
+        print(f"  {r['symbol']}: {r['bars']} -> {r['drawn_bars']} 根K线，"
+              f"{r['seconds']:.2f} 秒，{r['size'] / 1024:.1f} KB -> {r['output']}")
+
+    print("\n" + "=" * 60)
+    print(f"完成，共 {len(results)} 张图表")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
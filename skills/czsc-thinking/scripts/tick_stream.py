@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+实时 Tick 流合成分钟K线，并增量更新 CZSC 对象
+
+这个脚本从 tick 文件回放或本地 socket 读取逐笔成交，增量合成 1/5/15/30 分钟K线，
+把已完成和正在形成的K线推送给每个股票、每个周期各自的 CZSC 对象，
+并统计从收到 tick 到 CZSC 更新完成（信号可用）的端到端延迟。
+
+Tick 格式（CSV，每行一条，可带表头）：
+    symbol,dt,price,vol,amount
+    000001.SZ,2024-06-14 09:30:03,10.52,1200,12624
+
+使用方法：
+    python tick_stream.py --input ticks.csv
+    python tick_stream.py --host 127.0.0.1 --port 9000 --freqs 1,5,30
+
+依赖：
+    pip install czsc
+"""
+
+import argparse
+import socket
+import time
+from collections import deque
+from datetime import datetime, time as dtime, timedelta
+
+from czsc import CZSC, RawBar, Freq
+
+
+FREQ_MAP = {
+    1: Freq.F1,
+    5: Freq.F5,
+    15: Freq.F15,
+    30: Freq.F30,
+}
+
+# A 股连续竞价开始时间，之前的集合竞价 tick 归入第一根K线
+SESSION_OPEN = dtime(9, 30)
+
+# A 股交易时段结束时间，这一分钟内的 tick（收盘集合竞价成交）归入正在结束的K线
+SESSION_ENDS = (dtime(11, 30), dtime(15, 0))
+
+
+def parse_tick(line):
+    """
+    解析一行 tick 数据
+
+    参数：
+        line: str, 'symbol,dt,price,vol,amount' 格式的文本
+
+    返回：
+        tuple: (symbol, dt, price, vol, amount)；表头或空行返回 None
+
+    异常：
+        ValueError: 时间或数值字段无法解析
+    """
+    parts = line.strip().split(',')
+    if len(parts) < 3 or parts[0] == 'symbol':
+        return None
+    symbol, dt, price = parts[0], datetime.fromisoformat(parts[1]), float(parts[2])
+    vol = float(parts[3]) if len(parts) > 3 and parts[3] else 0.0
+    amount = float(parts[4]) if len(parts) > 4 and parts[4] else price * vol
+    return symbol, dt, price, vol, amount
+
+
+def replay_file(filepath):
+    """
+    从文件回放 tick，回放速度由 StreamingCZSC.run 的 speed 参数控制
+
+    参数：
+        filepath: str, tick 文件路径
+
+    返回：
+        generator: 逐行产出 tick 文本
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield line
+
+
+def read_socket(host, port):
+    """
+    从本地 socket 读取 tick，每行一条，连接关闭时结束
+
+    参数：
+        host: str, 地址
+        port: int, 端口
+
+    返回：
+        generator: 逐行产出 tick 文本
+    """
+    with socket.create_connection((host, port)) as conn:
+        print(f"已连接 tick 源 {host}:{port}")
+        with conn.makefile('r', encoding='utf-8') as f:
+            for line in f:
+                yield line
+
+
+class BarAggregator:
+    """
+    单个股票的多周期K线合成器
+
+    K线时间采用结束时间标记（与 czsc 一致）：09:30:03 的 tick 属于 09:31 的 1 分钟K线；
+    开盘集合竞价的 tick 归入第一根K线，11:30、15:00 这一分钟内的 tick 归入正在收盘的K线，
+    不会单独形成 11:31、15:01 之类的K线。早于当前K线的迟到 tick 被丢弃，计入 late。
+    """
+
+    def __init__(self, symbol, freqs):
+        """
+        参数：
+            symbol: str, 股票代码
+            freqs: list, 分钟周期列表，如 [1, 5, 30]
+        """
+        self.symbol = symbol
+        self.freqs = freqs
+        # 每个周期正在形成的K线：[dt, open, close, high, low, vol, amount]
+        self.current = {n: None for n in freqs}
+        self.count = {n: 0 for n in freqs}
+        self.late = 0
+
+    def _make_bar(self, n, state):
+        dt, open_, close, high, low, vol, amount = state
+        return RawBar(symbol=self.symbol, dt=dt, freq=FREQ_MAP[n], open=open_, close=close,
+                      high=high, low=low, vol=vol, amount=amount, id=self.count[n])
+
+    @staticmethod
+    def bar_end(dt, n):
+        """返回 tick 所属 n 分钟K线的结束时间"""
+        minute = dt.replace(second=0, microsecond=0)
+        if minute.time() < SESSION_OPEN:
+            minute = minute.replace(hour=SESSION_OPEN.hour, minute=SESSION_OPEN.minute)
+        minutes = minute.hour * 60 + minute.minute
+        if minute.time() in SESSION_ENDS:
+            # 收盘这一分钟的 tick 属于以该时刻结束的K线
+            return minute + timedelta(minutes=-minutes % n)
+        return minute + timedelta(minutes=n - minutes % n)
+
+    def update(self, dt, price, vol, amount):
+        """
+        用一个 tick 更新全部周期
+
+        返回：
+            list: (分钟周期, 已完成的 RawBar) 列表，没有K线完成或 tick 迟到时为空
+        """
+        ends = [self.bar_end(dt, n) for n in self.freqs]
+        if any(state is not None and end < state[0] for end, state in zip(ends, self.current.values())):
+            self.late += 1
+            return []
+
+        completed = []
+        for n, bar_dt in zip(self.freqs, ends):
+            state = self.current[n]
+            if state is not None and state[0] == bar_dt:
+                state[2] = price
+                if price > state[3]:
+                    state[3] = price
+                if price < state[4]:
+                    state[4] = price
+                state[5] += vol
+                state[6] += amount
+                continue
+            if state is not None:
+                completed.append((n, self._make_bar(n, state)))
+                self.count[n] += 1
+            self.current[n] = [bar_dt, price, price, price, price, vol, amount]
+        return completed
+
+    def partial(self, n):
+        """返回周期 n 正在形成的K线，没有则返回 None"""
+        state = self.current[n]
+        return None if state is None else self._make_bar(n, state)
+
+
+class LatencyStats:
+    """tick -> 信号端到端延迟统计，保留最近 window 个样本计算分位数"""
+
+    def __init__(self, window=100000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.started = time.perf_counter()
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self):
+        """
+        返回：
+            dict: 处理数量、吞吐量（tick/秒）以及延迟均值、P50、P99、最大值（微秒）
+        """
+        elapsed = time.perf_counter() - self.started
+        ordered = sorted(self.samples)
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1e6 if ordered else 0.0
+
+        return {
+            'ticks': self.count,
+            'ticks_per_sec': self.count / elapsed if elapsed > 0 else 0.0,
+            'mean_us': self.total / self.count * 1e6 if self.count else 0.0,
+            'p50_us': pct(0.5),
+            'p99_us': pct(0.99),
+            'max_us': self.max * 1e6,
+        }
+
+
+class StreamingCZSC:
+    """
+    多股票、多周期的流式 CZSC 引擎
+
+    已完成的K线总是推送给 CZSC；正在形成的K线按 partial_interval 节流推送，
+    CZSC.update 遇到相同 dt 的K线会替换最后一根，因此可以反复推送同一根未完成K线。
+    """
+
+    def __init__(self, freqs=(1, 5, 30), max_bi_num=50, partial_interval=1.0, on_update=None):
+        """
+        参数：
+            freqs: tuple, 分钟周期
+            max_bi_num: int, 每个 CZSC 对象保留的最大笔数量
+            partial_interval: float, 未完成K线的最小推送间隔（秒，按 tick 时间）；小于 0 表示不推送
+            on_update: callable, CZSC 更新后的回调 on_update(symbol, n, czsc_obj, bar, completed)
+        """
+        for n in freqs:
+            if n not in FREQ_MAP:
+                raise ValueError(f"不支持的周期：{n} 分钟，可选 {sorted(FREQ_MAP)}")
+        self.freqs = list(freqs)
+        self.max_bi_num = max_bi_num
+        self.partial_interval = timedelta(seconds=partial_interval) if partial_interval >= 0 else None
+        self.on_update = on_update
+        self.aggregators = {}
+        self.czsc = {}
+        self.last_push = {}
+        self.latency = LatencyStats()
+        self.bad_lines = 0
+
+    def _push(self, symbol, n, bar, completed):
+        key = (symbol, n)
+        obj = self.czsc.get(key)
+        if obj is None:
+            obj = self.czsc[key] = CZSC([bar], max_bi_num=self.max_bi_num)
+        else:
+            obj.update(bar)
+        if self.on_update is not None:
+            self.on_update(symbol, n, obj, bar, completed)
+
+    def process(self, tick, received=None):
+        """
+        处理一个 tick
+
+        参数：
+            tick: tuple, parse_tick 的返回值
+            received: float, 收到 tick 时的 time.perf_counter()，默认为当前时间
+        """
+        if received is None:
+            received = time.perf_counter()
+        symbol, dt, price, vol, amount = tick
+
+        agg = self.aggregators.get(symbol)
+        if agg is None:
+            agg = self.aggregators[symbol] = BarAggregator(symbol, self.freqs)
+
+        for n, bar in agg.update(dt, price, vol, amount):
+            self._push(symbol, n, bar, True)
+
+        if self.partial_interval is not None:
+            last = self.last_push.get(symbol)
+            if last is None or dt - last >= self.partial_interval:
+                self.last_push[symbol] = dt
+                for n in self.freqs:
+                    self._push(symbol, n, agg.partial(n), False)
+
+        self.latency.record(time.perf_counter() - received)
+
+    def run(self, lines, speed=0.0):
+        """
+        消费 tick 文本流直到结束
+
+        无法解析的行被跳过并计入 bad_lines，不会中断实时行情。
+
+        参数：
+            lines: iterable, tick 文本行，如 replay_file 或 read_socket 的返回值
+            speed: float, 按 tick 时间间隔的回放倍速；0 表示不等待（实时行情应为 0）
+        """
+        last_dt, last_wall = None, None
+        for line in lines:
+            received = time.perf_counter()
+            try:
+                tick = parse_tick(line)
+            except ValueError:
+                self.bad_lines += 1
+                continue
+            if tick is None:
+                continue
+            if speed > 0:
+                if last_dt is not None:
+                    wait = (tick[1] - last_dt).total_seconds() / speed - (received - last_wall)
+                    if wait > 0:
+                        time.sleep(wait)
+                        received = time.perf_counter()
+                last_dt, last_wall = tick[1], received
+            self.process(tick, received)
+
+    @property
+    def late_ticks(self):
+        """各股票被丢弃的迟到 tick 总数"""
+        return sum(agg.late for agg in self.aggregators.values())
+
+    def flush(self):
+        """流结束时把所有未完成的K线作为已完成K线推送"""
+        for symbol, agg in self.aggregators.items():
+            for n in self.freqs:
+                bar = agg.partial(n)
+                if bar is not None:
+                    self._push(symbol, n, bar, True)
+
+
+_last_bi = {}
+
+
+def print_new_bi(symbol, n, czsc_obj, bar, completed):
+    """回调示例：已完成K线使笔数量增加时打印新笔"""
+    if not completed or not czsc_obj.bi_list:
+        return
+    bi = czsc_obj.bi_list[-1]
+    key = (symbol, n)
+    if _last_bi.get(key) == bi.fx_a.dt:
+        return
+    _last_bi[key] = bi.fx_a.dt
+    print(f"  {bar.dt.strftime('%Y-%m-%d %H:%M')} {symbol} {n}分钟 新笔："
+          f"{str(bi.direction)} {bi.fx_a.fx:.2f} -> {bi.fx_b.fx:.2f}")
+
+
+def print_latency(stats):
+    """打印延迟统计"""
+    print(f"\n处理 tick 数：{stats['ticks']}")
+    print(f"吞吐量：{stats['ticks_per_sec']:.0f} tick/秒")
+    print(f"tick -> 信号延迟：均值 {stats['mean_us']:.1f}us，P50 {stats['p50_us']:.1f}us，"
+          f"P99 {stats['p99_us']:.1f}us，最大 {stats['max_us']:.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tick 流实时合成K线并更新 CZSC')
+    parser.add_argument('--input', type=str, help='tick 回放文件（CSV格式）')
+    parser.add_argument('--speed', type=float, default=0.0, help='回放倍速，默认 0 表示尽快回放')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='tick socket 地址')
+    parser.add_argument('--port', type=int, help='tick socket 端口')
+    parser.add_argument('--freqs', type=str, default='1,5,30', help='分钟周期，逗号分隔，默认 1,5,30')
+    parser.add_argument('--max_bi', type=int, default=50, help='最大笔数量，默认 50')
+    parser.add_argument('--partial_interval', type=float, default=1.0,
+                        help='未完成K线推送间隔（秒），负数表示只推送已完成K线，默认 1')
+    parser.add_argument('--quiet', action='store_true', help='不打印新笔，只输出延迟统计')
+
+    args = parser.parse_args()
+
+    if args.input:
+        lines = replay_file(args.input)
+    elif args.port:
+        lines = read_socket(args.host, args.port)
+    else:
+        parser.print_help()
+        return
+
+    engine = StreamingCZSC(
+        freqs=[int(x) for x in args.freqs.split(',')],
+        max_bi_num=args.max_bi,
+        partial_interval=args.partial_interval,
+        on_update=None if args.quiet else print_new_bi,
+    )
+
+    print("\n" + "=" * 60)
+    print("实时缠论结构")
+    print("=" * 60)
+    try:
+        engine.run(lines, speed=args.speed if args.input else 0.0)
+    except KeyboardInterrupt:
+        print("\n已中断")
+    engine.flush()
+
+    print("\n" + "=" * 60)
+    print("延迟统计")
+    print("=" * 60)
+    print(f"股票数量：{len(engine.aggregators)}")
+    print(f"无法解析的行：{engine.bad_lines}，迟到丢弃的 tick：{engine.late_ticks}")
+    print_latency(engine.latency.summary())
+
+
+if __name__ == '__main__':
+    main()
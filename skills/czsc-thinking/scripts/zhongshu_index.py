@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基于笔序列识别中枢，并建立区间索引
+
+这个脚本从 CZSC 对象的 bi_list 中一次线性扫描识别全部历史中枢，
+并把中枢按价格区间 [ZD, ZG] 和时间区间 [sdt, edt] 存入区间树，
+用于快速回答以下问题：
+    - 价格 X 落在哪些中枢内？
+    - 当前笔是否已经离开最后一个中枢？（三买/三卖的前提）
+    - 某个日期范围内有哪些中枢？
+
+使用方法：
+    python zhongshu_index.py --input data.csv --symbol 000001.SZ
+    python zhongshu_index.py --input data.csv --symbol 000001.SZ --price 10.5
+
+依赖：
+    pip install czsc pandas
+"""
+
+import argparse
+import heapq
+from dataclasses import dataclass
+from datetime import datetime
+
+from czsc import CZSC
+
+from analyze_czsc_structure import load_data_from_csv, convert_to_raw_bars
+
+
+@dataclass
+class Zhongshu:
+    """
+    中枢：至少三笔连续重叠的价格区间
+
+    属性：
+        symbol: str, 股票代码
+        level: str, 中枢所在级别，如 '日线'、'30分钟'
+        start: int, 构成中枢的第一笔在 bi_list 中的下标
+        end: int, 构成中枢的最后一笔在 bi_list 中的下标（含）
+        zg: float, 中枢上沿，前三笔高点的最小值
+        zd: float, 中枢下沿，前三笔低点的最大值
+        gg: float, 中枢内所有笔的最高点
+        dd: float, 中枢内所有笔的最低点
+        sdt: datetime, 中枢开始时间
+        edt: datetime, 中枢结束时间
+    """
+    symbol: str
+    level: str
+    start: int
+    end: int
+    zg: float
+    zd: float
+    gg: float
+    dd: float
+    sdt: datetime
+    edt: datetime
+
+    @property
+    def bi_count(self):
+        """构成中枢的笔数"""
+        return self.end - self.start + 1
+
+
+def _bi_high_low(bi):
+    """返回笔的 (高点, 低点)"""
+    a, b = bi.fx_a.fx, bi.fx_b.fx
+    return (a, b) if a > b else (b, a)
+
+
+def find_zhongshu(bi_list, symbol='', level=''):
+    """
+    一次线性扫描识别笔序列中的全部中枢
+
+    规则：连续三笔的重叠区间 [max(低点), min(高点)] 非空即形成中枢；
+    之后的笔只要与 [ZD, ZG] 有重叠就视为中枢延伸，否则中枢结束，
+    离开笔可以作为下一个中枢的第一笔。
+
+    参数：
+        bi_list: list, CZSC 对象的 bi_list
+        symbol: str, 股票代码
+        level: str, 级别名称
+
+    返回：
+        list: Zhongshu 对象列表，按时间先后排列
+    """
+    zs_list = []
+    current = None
+    highs, lows = [], []
+
+    for i, bi in enumerate(bi_list):
+        high, low = _bi_high_low(bi)
+
+        if current is not None:
+            if low <= current.zg and high >= current.zd:
+                current.end = i
+                current.gg = max(current.gg, high)
+                current.dd = min(current.dd, low)
+                current.edt = bi.fx_b.dt
+                continue
+            zs_list.append(current)
+            current = None
+            highs, lows = [], []
+
+        highs.append(high)
+        lows.append(low)
+        if len(highs) > 3:
+            highs.pop(0)
+            lows.pop(0)
+        if len(highs) < 3:
+            continue
+
+        zg, zd = min(highs), max(lows)
+        if zg > zd:
+            first = bi_list[i - 2]
+            current = Zhongshu(
+                symbol=symbol, level=level, start=i - 2, end=i,
+                zg=zg, zd=zd, gg=max(highs), dd=min(lows),
+                sdt=first.fx_a.dt, edt=bi.fx_b.dt,
+            )
+
+    if current is not None:
+        zs_list.append(current)
+    return zs_list
+
+
+class IntervalTree:
+    """
+    静态区间树（centered interval tree）
+
+    构建 O(n log n)，点查询与区间查询 O(log n + k)，k 为命中数量。
+    区间端点只需可比较，价格（float）与时间（datetime）均可使用。
+    """
+
+    def __init__(self, items):
+        """
+        参数：
+            items: list, (lo, hi, value) 三元组列表，要求 lo <= hi
+        """
+        items = list(items)
+        self._root = self._build(sorted(items, key=lambda x: x[0]), sorted(items, key=lambda x: x[1]))
+
+    @classmethod
+    def _build(cls, by_lo, by_hi):
+        """
+        参数：
+            by_lo: list, 按 lo 升序排列的区间
+            by_hi: list, 同一组区间按 hi 升序排列
+
+        只在构建开始时排序一次，各层通过归并取端点中位数、按原顺序划分子树，每层 O(n)。
+        """
+        if not by_lo:
+            return None
+        points = list(heapq.merge((x[0] for x in by_lo), (x[1] for x in by_hi)))
+        center = points[len(points) // 2]
+
+        def split(items):
+            left, right, here = [], [], []
+            for item in items:
+                if item[1] < center:
+                    left.append(item)
+                elif item[0] > center:
+                    right.append(item)
+                else:
+                    here.append(item)
+            return left, right, here
+
+        left_lo, right_lo, here_lo = split(by_lo)
+        left_hi, right_hi, here_hi = split(by_hi)
+        return (
+            center,
+            here_lo,
+            here_hi[::-1],
+            cls._build(left_lo, left_hi),
+            cls._build(right_lo, right_hi),
+        )
+
+    def query_point(self, x):
+        """返回所有包含 x 的区间的 value"""
+        result = []
+        node = self._root
+        while node is not None:
+            center, by_lo, by_hi, left, right = node
+            if x < center:
+                for lo, _, value in by_lo:
+                    if lo > x:
+                        break
+                    result.append(value)
+                node = left
+            elif x > center:
+                for _, hi, value in by_hi:
+                    if hi < x:
+                        break
+                    result.append(value)
+                node = right
+            else:
+                result.extend(value for _, _, value in by_lo)
+                break
+        return result
+
+    def query_range(self, start, end):
+        """返回所有与 [start, end] 有重叠的区间的 value"""
+        result = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            center, by_lo, by_hi, left, right = node
+            if end < center:
+                for lo, _, value in by_lo:
+                    if lo > end:
+                        break
+                    result.append(value)
+                stack.append(left)
+            elif start > center:
+                for _, hi, value in by_hi:
+                    if hi < start:
+                        break
+                    result.append(value)
+                stack.append(right)
+            else:
+                result.extend(value for _, _, value in by_lo)
+                stack.append(left)
+                stack.append(right)
+        return result
+
+
+class ZhongshuIndex:
+    """
+    中枢区间索引，可同时容纳多个股票、多个级别的中枢
+
+    每个 (股票, 级别) 维护独立的价格和时间区间树，在该键第一次被查询时构建；
+    加入新中枢只会让对应键的区间树失效，指定股票和级别的查询复杂度与其他股票的中枢数量无关。
+
+    使用方法：
+        index = ZhongshuIndex()
+        index.add_bis(czsc_obj.bi_list, symbol='000001.SZ', level='日线')
+        index.by_price(10.5, symbol='000001.SZ', level='日线')
+        index.by_date('2024-01-01', '2024-06-30')
+        index.leaving(czsc_obj.bi_list[-1], symbol='000001.SZ', level='日线')
+    """
+
+    def __init__(self, zs_list=None):
+        self.zs_list = []
+        self._groups = {}
+        self._trees = {}
+        if zs_list:
+            self.add(zs_list)
+
+    def add(self, zs_list):
+        """加入中枢列表，涉及的 (股票, 级别) 的区间树在下一次查询时重建"""
+        for zs in zs_list:
+            key = (zs.symbol, zs.level)
+            self.zs_list.append(zs)
+            self._groups.setdefault(key, []).append(zs)
+            self._trees.pop(key, None)
+
+    def add_bis(self, bi_list, symbol='', level=''):
+        """从笔序列识别中枢并加入索引，返回识别出的中枢列表"""
+        zs_list = find_zhongshu(bi_list, symbol=symbol, level=level)
+        self.add(zs_list)
+        return zs_list
+
+    def _keys(self, symbol, level):
+        if symbol is not None and level is not None:
+            return [(symbol, level)] if (symbol, level) in self._groups else []
+        return [key for key in self._groups
+                if (symbol is None or key[0] == symbol) and (level is None or key[1] == level)]
+
+    def _tree(self, key):
+        trees = self._trees.get(key)
+        if trees is None:
+            group = self._groups[key]
+            trees = (IntervalTree((zs.zd, zs.zg, zs) for zs in group),
+                     IntervalTree((zs.sdt, zs.edt, zs) for zs in group))
+            self._trees[key] = trees
+        return trees
+
+    def by_price(self, price, symbol=None, level=None):
+        """
+        查询中枢区间 [ZD, ZG] 包含指定价格的全部中枢
+
+        参数：
+            price: float, 价格
+            symbol: str, 只返回该股票的中枢，默认返回全部股票
+            level: str, 只返回该级别的中枢，默认返回全部级别
+
+        返回：
+            list: 按开始时间排序的 Zhongshu 列表
+        """
+        result = []
+        for key in self._keys(symbol, level):
+            result.extend(self._tree(key)[0].query_point(price))
+        return sorted(result, key=lambda zs: zs.sdt)
+
+    def by_date(self, start, end, symbol=None, level=None):
+        """
+        查询与日期范围 [start, end] 有重叠的全部中枢
+
+        参数：
+            start: str 或 datetime, 开始日期
+            end: str 或 datetime, 结束日期
+            symbol: str, 只返回该股票的中枢，默认返回全部股票
+            level: str, 只返回该级别的中枢，默认返回全部级别
+
+        返回：
+            list: 按开始时间排序的 Zhongshu 列表
+        """
+        start, end = _to_datetime(start), _to_datetime(end)
+        result = []
+        for key in self._keys(symbol, level):
+            result.extend(self._tree(key)[1].query_range(start, end))
+        return sorted(result, key=lambda zs: zs.sdt)
+
+    def last(self, symbol='', level=''):
+        """返回指定股票、指定级别的最后一个中枢，没有则返回 None"""
+        group = self._groups.get((symbol, level))
+        return group[-1] if group else None
+
+    def leaving(self, bi, symbol='', level=''):
+        """
+        判断笔是否已经离开该股票、该级别的最后一个中枢
+
+        笔完全位于 ZG 之上（如三买的回抽笔）为向上离开，完全位于 ZD 之下为向下离开；
+        与 [ZD, ZG] 仍有重叠的笔属于中枢延伸。
+
+        参数：
+            bi: 笔对象，通常为 czsc_obj.bi_list[-1]
+            symbol: str, 股票代码
+            level: str, 级别名称
+
+        返回：
+            str: '向上离开'、'向下离开'；未离开或没有中枢时返回 None
+        """
+        zs = self.last(symbol, level)
+        if zs is None or bi.fx_a.dt < zs.edt:
+            return None
+        high, low = _bi_high_low(bi)
+        if low > zs.zg:
+            return '向上离开'
+        if high < zs.zd:
+            return '向下离开'
+        return None
+
+
+def _to_datetime(value):
+    """把字符串日期转换为 datetime，其他类型原样返回"""
+    if isinstance(value, str):
+        value = value.replace('-', '')
+        return datetime.strptime(value[:8], '%Y%m%d')
+    return value
+
+
+def print_zhongshu(zs_list, title):
+    """打印中枢列表"""
+    print(f"\n{title}：{len(zs_list)} 个")
+    for zs in zs_list:
+        print(f"  {zs.sdt.strftime('%Y-%m-%d')} -> {zs.edt.strftime('%Y-%m-%d')}: "
+              f"ZD {zs.zd:.2f} - ZG {zs.zg:.2f} "
+              f"(DD {zs.dd:.2f}, GG {zs.gg:.2f}, {zs.bi_count} 笔)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='识别中枢并建立区间索引')
+    parser.add_argument('--input', type=str, required=True, help='输入数据文件（CSV格式）')
+    parser.add_argument('--symbol', type=str, required=True, help='股票代码')
+    parser.add_argument('--freq', type=str, default='日线', help='分析周期，默认为日线')
+    parser.add_argument('--price', type=float, help='查询包含该价格的中枢')
+    parser.add_argument('--start_date', type=str, help='查询日期范围的开始日期，格式 YYYYMMDD')
+    parser.add_argument('--end_date', type=str, help='查询日期范围的结束日期，格式 YYYYMMDD')
+
+    args = parser.parse_args()
+
+    # 加载数据
+    df = load_data_from_csv(args.input)
+    raw_bars = convert_to_raw_bars(df, args.symbol)
+
+    # 保留全部历史笔，中枢需要完整的笔序列
+    print(f"\n正在创建 CZSC 对象（周期：{args.freq}）...")
+    czsc_obj = CZSC(raw_bars, max_bi_num=len(raw_bars))
+
+    index = ZhongshuIndex()
+    zs_list = index.add_bis(czsc_obj.bi_list, symbol=args.symbol, level=args.freq)
+
+    print("\n" + "=" * 60)
+    print("中枢分析")
+    print("=" * 60)
+    print(f"\n中枢数量：{len(zs_list)}")
+    print_zhongshu(zs_list[-5:], "最近的中枢")
+
+    if czsc_obj.bi_list:
+        state = index.leaving(czsc_obj.bi_list[-1], symbol=args.symbol, level=args.freq)
+        print(f"\n当前笔相对最后一个中枢：{state or '未离开'}")
+
+    if args.price is not None:
+        print_zhongshu(index.by_price(args.price), f"包含价格 {args.price:.2f} 的中枢")
+
+    if args.start_date and args.end_date:
+        print_zhongshu(index.by_date(args.start_date, args.end_date),
+                       f"{args.start_date} - {args.end_date} 内的中枢")
+
+    print("\n" + "=" * 60)
+    print("分析完成")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()